@@ -1,31 +1,91 @@
-import json
+import asyncio
 import logging
 import contextlib
+import os
 import re
+import tempfile
+import threading
+from urllib.parse import urljoin
+import httpx
+import orjson
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 
 # Set up structured logging with timestamps
 logging.basicConfig(level=logging.INFO)
 
-# Configure webdriver_manager logging level
-logging.getLogger('webdriver_manager').setLevel(logging.WARNING)
+# Configure httpx logging level
+logging.getLogger('httpx').setLevel(logging.WARNING)
 
 # Constants
 LAST_VISITED_FILE = 'Backend\last_visited.json'
 BASE_URL = "https://ised-isde.canada.ca"
+MAX_CONCURRENT_FETCHES = 8
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; Spectrum_Decisions scraper)',
+    'Accept': 'text/html,application/xhtml+xml',
+    'Accept-Language': 'en-CA,en;q=0.9',
+}
+
+# Decision table columns that need reformatting
+FREQUENCY_FIELDS = (
+    'Frequency range (MHz)',
+    'Frequency range (MHz) of the primary licence',
+    'Frequency range (MHz) of the subordinate licence',
+)
+TIER_FIELDS = (
+    'Tier number and geographic area of the licence',
+    'Tier number and geographic area of the subordinate licence',
+    'Tier number and geographic area of the primary licence',
+)
+
+# Precompiled XPath queries used by the extractors
+_ROWS_XP = etree.XPath('//tbody/tr[@role="row"]')
+_ROW_HREFS_XP = etree.XPath('//tbody/tr[@role="row"]/descendant::a[@href][1]/@href')
+_TABLE_XP = etree.XPath('//table[contains(@class, "table-bordered")]')
+_CAPTION_XP = etree.XPath('.//caption[contains(@class, "bg-primary")]')
+
+# Elements the WebDriver fallback waits for before reading the page source; the
+# eager page load strategy returns before scripts such as DataTables have run
+_ROWS_LOCATOR = (By.CSS_SELECTOR, 'tbody tr[role="row"]')
+_TABLE_LOCATOR = (By.CSS_SELECTOR, 'table.table-bordered')
+
+# Matches a single low/high frequency pair separated by '-' or '/'; concatenated
+# ranges such as "1900-19101910-1920" simply yield consecutive pairs
+_FREQ_RE = re.compile(r"(\d{3,4})\s*[-/]\s*(\d{3,4})")
+
+# Context manager for the HTTP client used for static page fetches
+@contextlib.asynccontextmanager
+async def http_client_context():
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT_FETCHES)
+    async with httpx.AsyncClient(http2=True, headers=HTTP_HEADERS, timeout=10,
+                                 follow_redirects=True, limits=limits) as client:
+        yield client
 
 # Context manager for WebDriver
 @contextlib.contextmanager
 def webdriver_context():
     try:
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service)
+        # Headless session that skips images and notifications; only the HTML is needed
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless=new')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.page_load_strategy = 'eager'
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+        })
+        # Selenium Manager resolves and caches chromedriver; CHROMEDRIVER_PATH pins a local binary instead
+        driver_path = os.environ.get('CHROMEDRIVER_PATH')
+        service = Service(driver_path) if driver_path else Service()
+        driver = webdriver.Chrome(service=service, options=options)
+        driver.set_page_load_timeout(15)
         yield driver
     except Exception as e:
         logging.error(f"Error initializing WebDriver: {e}")
@@ -34,115 +94,132 @@ def webdriver_context():
         if 'driver' in locals():
             driver.quit()
 
-def fetch_and_parse_url(url, driver):
+def lazy_renderer(stack):
+    # Only start Chrome the first time a page actually needs JavaScript rendering.
+    # The single driver is shared, so renders are serialised with a lock.
+    drivers = []
+    lock = threading.Lock()
+    def render(url, locator):
+        with lock:
+            if not drivers:
+                drivers.append(stack.enter_context(webdriver_context()))
+            return render_page(url, drivers[0], locator)
+    return render
+
+async def fetch_static_page(url, client):
+    response = await client.get(url)
+    response.raise_for_status()
+    return lxml.html.fromstring(response.content)
+
+def render_page(url, driver, locator):
+    driver.get(url)
+    WebDriverWait(driver, 10).until(EC.presence_of_element_located(locator))
+    return lxml.html.fromstring(driver.page_source)
+
+async def fetch_and_parse_url(url, client, render):
     try:
-        driver.get(url)
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, 'html')))
-        return BeautifulSoup(driver.page_source, 'html.parser')
+        tree = await fetch_static_page(url, client)
+        if not _ROWS_XP(tree):
+            logging.info("No decision rows in static HTML, falling back to WebDriver.")
+            tree = await asyncio.to_thread(render, url, _ROWS_LOCATOR)
+            if not _ROWS_XP(tree):
+                logging.warning(f"No decision rows found after rendering {url}.")
+        return tree
     except Exception as e:
         logging.error(f"Error fetching URL: {e}")
         return None
 
 def get_last_visited():
     try:
-        with open(LAST_VISITED_FILE, 'r') as file:
-            data = json.load(file)
+        with open(LAST_VISITED_FILE, 'rb') as file:
+            data = orjson.loads(file.read())
             return data.get('last_visited')
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+    except (FileNotFoundError, orjson.JSONDecodeError) as e:
         logging.warning(f"Error reading last visited file: {e}")
         return None
 
 def save_last_visited(href):
     try:
-        with open(LAST_VISITED_FILE, 'w') as file:
-            json.dump({'last_visited': href}, file)
+        # Write to a temporary file and swap it in so an interrupted write never corrupts the old one
+        directory = os.path.dirname(LAST_VISITED_FILE) or '.'
+        with tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.tmp', delete=False) as file:
+            file.write(orjson.dumps({'last_visited': href}))
+        os.replace(file.name, LAST_VISITED_FILE)
     except IOError as e:
         logging.error(f"Error saving last visited link: {e}")
 
-def extract_decision_links(soup, last_visited):
+def extract_decision_links(tree, last_visited):
     logging.info("Extracting decision links...")
-    decision_rows = soup.select('tbody tr[role="row"]')
-    logging.info(f"Found {len(decision_rows)} rows.")
+    # First link of every decision row, collected in a single XPath pass
+    hrefs = _ROW_HREFS_XP(tree)
+    logging.info(f"Found {len(hrefs)} rows with links.")
     links = []
-    for row in decision_rows:
-        link = row.find('a', href=True)
-        if link:
-            href = link['href']
-            full_href = f'https://ised-isde.canada.ca{href}' if not href.startswith('http') else href
-            title = link.get_text(strip=True)
-            if full_href == last_visited:
-                logging.info("Reached the last visited link. Stopping extraction.")
-                break
-            links.append(full_href)
+    for href in hrefs:
+        full_href = urljoin(BASE_URL, href)
+        if full_href == last_visited:
+            logging.info("Reached the last visited link. Stopping extraction.")
+            break
+        links.append(full_href)
     logging.info(f"Extracted {len(links)} new links.")
-    return links[::-1]  # Reverse to process oldest first
+    links.reverse()  # Reverse in place to process oldest first
+    return links
 
-def fetch_decision_page(url, driver):
+async def fetch_decision_page(url, client, render):
     logging.info(f"Fetching decision page: {url}")
     try:
-        driver.get(url)
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, 'html')))
-        return BeautifulSoup(driver.page_source, 'html.parser')
+        tree = await fetch_static_page(url, client)
+        if not _TABLE_XP(tree):
+            logging.info("No decision table in static HTML, falling back to WebDriver.")
+            tree = await asyncio.to_thread(render, url, _TABLE_LOCATOR)
+            if not _TABLE_XP(tree):
+                logging.warning(f"No decision table found after rendering {url}.")
+        return tree
     except Exception as e:
         logging.error(f"Error fetching decision page: {e}")
         return None
 
 
 def format_frequency_range(freq_range):
-    # Regular expression to match various formats including concatenated frequencies
-    pattern = r"(\d{3,4})- ?(\d{3,4})|(\d{3,4})/ ?(\d{3,4})|(\d{3,4})-(\d{3,4})(\d{3,4})-(\d{3,4})"
-    matches = re.findall(pattern, freq_range)
-
-    formatted_ranges = []
-    for match in matches:
-        nums = [m for m in match if m]
-        if len(nums) == 2:
-            formatted_ranges.append('{}-{}'.format(nums[0], nums[1]))
-        elif len(nums) == 4:
-            formatted_ranges.append('{}-{} {}-{}'.format(nums[0], nums[1], nums[2], nums[3]))
-
-    return ' '.join(formatted_ranges)
-
-def extract_data(soup):
-    if not soup:
+    matches = _FREQ_RE.findall(freq_range)
+    return ' '.join('{}-{}'.format(low, high) for low, high in matches)
+
+def element_text(element):
+    # Collapse all whitespace runs (including newlines and non-breaking spaces) to single spaces
+    return ' '.join(element.text_content().split())
+
+def extract_data(tree):
+    if tree is None:
         return []
 
-    table = soup.find('table', {'class': 'table-bordered'})  # Assuming 'table-bordered' is part of the class list for the table
-    caption = table.find('caption', {'class': 'bg-primary'}) if table else None
-    table_title = caption.get_text(strip=True) if caption else "Unknown Table Title"
+    tables = _TABLE_XP(tree)  # Assuming 'table-bordered' is part of the class list for the table
+    table = tables[0] if tables else None
+    captions = _CAPTION_XP(table) if table is not None else []
+    table_title = element_text(captions[0]) if captions else "Unknown Table Title"
 
-    rows = table.find_all('tr') if table else []
+    rows = list(table.iter('tr')) if table is not None else []
     data_list = []
 
     if rows:
-        headers = [header.get_text(strip=True).replace('\xa0', ' ') for header in rows[0].find_all('th')]
-        
+        headers = [element_text(header) for header in rows[0].iter('th')]
+
+        # Work out once which columns get reformatted; tier columns are split rather than copied
+        freq_cols = {i for i, header in enumerate(headers) if header in FREQUENCY_FIELDS}
+        tier_cols = [i for _, i in sorted((TIER_FIELDS.index(header), i)
+                                          for i, header in enumerate(headers) if header in TIER_FIELDS)]
+        skip_cols = set(tier_cols)
+
         for row in rows[1:]:
-            cols = row.find_all('td')
-            data = {headers[i]: col.get_text(strip=True).replace('\xa0', ' ') for i, col in enumerate(cols)}
-            
-            # Format frequency ranges
-            if 'Frequency range (MHz)' in data:
-                data['Frequency range (MHz)'] = format_frequency_range(data['Frequency range (MHz)'])
-            if 'Frequency range (MHz) of the primary licence' in data:
-                data['Frequency range (MHz) of the primary licence'] = format_frequency_range(data['Frequency range (MHz) of the primary licence'])
-            if 'Frequency range (MHz) of the subordinate licence' in data:
-                data['Frequency range (MHz) of the subordinate licence'] = format_frequency_range(data['Frequency range (MHz) of the subordinate licence'])
+            cells = [element_text(col) for col in row.iter('td')]
+            data = {headers[i]: format_frequency_range(cell) if i in freq_cols else cell
+                    for i, cell in enumerate(cells) if i not in skip_cols}
 
             # Split tier and geographic area fields
-            tier_fields = [
-                'Tier number and geographic area of the licence', 
-                'Tier number and geographic area of the subordinate licence',
-                'Tier number and geographic area of the primary licence'
-            ]
-            for field in tier_fields:
-                if field in data:
-                    tier_geo = data[field]
-                    parts = tier_geo.split(' ', 1)
+            for i in tier_cols:
+                if i < len(cells):
+                    parts = cells[i].split(' ', 1)
                     if len(parts) == 2:
                         data['Tier number'] = parts[0]
                         data['Geographic area of the licence'] = parts[1]
-                    del data[field]
 
             # Append the table title to the data
             data['Table Title'] = table_title
@@ -152,27 +229,53 @@ def extract_data(soup):
     return data_list
 
 
-def main():
-    with webdriver_context() as driver:
+async def fetch_and_extract(url, client, render, semaphore):
+    async with semaphore:
+        decision_tree = await fetch_decision_page(url, client, render)
+    try:
+        return extract_data(decision_tree)
+    except Exception as e:
+        logging.error(f"Error extracting data from {url}: {e}")
+        return []
+
+
+async def main():
+    async with http_client_context() as client, contextlib.AsyncExitStack() as stack:
+        render = lazy_renderer(stack)
         last_visited = get_last_visited()
-        main_soup = fetch_and_parse_url(BASE_URL + '/site/spectrum-management-telecommunications/en/spectrum-allocation/spectrum-licensing/decisions-licence-transfers-commercial-mobile-spectrum', driver)
+        main_tree = await fetch_and_parse_url(BASE_URL + '/site/spectrum-management-telecommunications/en/spectrum-allocation/spectrum-licensing/decisions-licence-transfers-commercial-mobile-spectrum', client, render)
         
-        if main_soup:
-            decision_links = extract_decision_links(main_soup, last_visited)
+        if main_tree is not None:
+            decision_links = extract_decision_links(main_tree, last_visited)
 
             if decision_links:
-                for decision_link in decision_links:
-                    decision_soup = fetch_decision_page(decision_link, driver)
-                    decision_data = extract_data(decision_soup)
-                    for data in decision_data:
-                        logging.info(json.dumps(data, indent=4))
-                    save_last_visited(decision_link)
+                # Fetch concurrently, but consume results in link order so progress only advances
+                # over the unbroken run of finished links
+                semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+                tasks = [asyncio.create_task(fetch_and_extract(link, client, render, semaphore))
+                         for link in decision_links]
+                # Skip serialising rows entirely when INFO logging is off
+                log_rows = logging.getLogger().isEnabledFor(logging.INFO)
+                latest = None
+                try:
+                    for decision_link, task in zip(decision_links, tasks):
+                        decision_data = await task
+                        if log_rows:
+                            for data in decision_data:
+                                logging.info(orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
+                        latest = decision_link
+                finally:
+                    for task in tasks:
+                        task.cancel()
+                    # Record progress once, even if interrupted part way through
+                    if latest:
+                        save_last_visited(latest)
                 logging.info("Extracted data from all decision links.")
             else:
                 logging.info("No new links to visit since the last check.")
 
 if __name__ == "__main__":
     try:
-        main()
+        asyncio.run(main())
     except Exception as e:
         logging.error(f"An error occurred: {e}", exc_info=True)
\ No newline at end of file
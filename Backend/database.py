@@ -1,8 +1,9 @@
 import duckdb
-import geopandas as gpd
+import pandas as pd
+import pyogrio
+import shapely
 import os
-import glob
-import tempfile
+import fnmatch
 import zipfile
 
 
@@ -10,51 +11,65 @@ def load_and_join_tiers(base_directory, num_tiers):
     tier_gdfs = []
     zip_file_path = os.path.join(base_directory, 'CanadaServiceAreasTAB.zip')
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-
-        for tier in range(1, num_tiers + 1):
-            tier_pattern = os.path.join(temp_dir, f'Tier{tier}_Niveau{tier}_*.tab')
-            matching_files = glob.glob(tier_pattern)
-
-            if not matching_files:
-                print(f"No files found for pattern: {tier_pattern}")
-                continue
-
-            tier_file = matching_files[0]
-            tier_gdf = gpd.read_file(tier_file)
-
-            if tier > 1:
-                tier_gdf = gpd.sjoin(tier_gdf, tier_gdfs[-1][['Service_Area_Zone_de_service', 'geometry']], 
-                                     how="left", predicate='intersects')
-                tier_gdf.rename(columns={'Service_Area_Zone_de_service_left': 'Service_Area_Zone_de_service',
-                                         'Service_Area_Zone_de_service_right': f'Tier{tier - 1}_Service_Area_Zone_de_service'},
-                                inplace=True)
-            tier_gdfs.append(tier_gdf)
+    # Read the TAB files in place through GDAL's /vsizip/ filesystem instead of extracting the archive
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+        members = zip_ref.namelist()
+
+    for tier in range(1, num_tiers + 1):
+        tier_pattern = f'Tier{tier}_Niveau{tier}_*.tab'
+        matching_files = fnmatch.filter(members, tier_pattern)
+
+        if not matching_files:
+            print(f"No files found for pattern: {tier_pattern}")
+            continue
+
+        tier_file = f'/vsizip/{zip_file_path}/{matching_files[0]}'
+        tier_gdf = pyogrio.read_dataframe(tier_file)
+
+        if tier > 1:
+            # Left join against the previous tier with a single bulk STRtree query
+            prev_gdf = tier_gdfs[-1]
+            tree = shapely.STRtree(prev_gdf.geometry.values)
+            idx_left, idx_right = tree.query(tier_gdf.geometry.values, predicate='intersects')
+            matches = pd.DataFrame({
+                'index_right': prev_gdf.index[idx_right],
+                f'Tier{tier - 1}_Service_Area_Zone_de_service': prev_gdf['Service_Area_Zone_de_service'].to_numpy()[idx_right],
+            }, index=tier_gdf.index[idx_left])
+            tier_gdf = tier_gdf.join(matches, how='left')
+        tier_gdfs.append(tier_gdf)
     return tier_gdfs
 
-def table_exists(conn, table_name):
-    # Query the DuckDB catalog to check if the table exists
-    query = f"SELECT COUNT(*) FROM information_schema.tables WHERE table_name = '{table_name}'"
-    result = conn.execute(query).fetchall()
-    return result[0][0] > 0
+def get_existing_tables(conn):
+    # Query the DuckDB catalog once for all tables in the main schema
+    query = "SELECT table_name FROM information_schema.tables WHERE table_schema = ?"
+    result = conn.execute(query, ['main']).fetchall()
+    return {row[0] for row in result}
 
 def create_and_populate_tables(conn, tier_gdfs):
-    for tier, gdf in enumerate(tier_gdfs, start=1):
-        table_name = f'Tier{tier}_Areas'
-        schema = ', '.join([f"{col} VARCHAR" for col in gdf.columns if col != 'geometry'] + ['Geometry STRING'])
-        if not table_exists(conn, table_name):
-            conn.execute(f"CREATE TABLE {table_name} ({schema})")
-
-        # Batch insert data
-        rows_to_insert = []
-        for index, row in gdf.iterrows():
-            row_data = [str(row[col]) if col != 'geometry' else row['geometry'].wkt for col in gdf.columns]
-            rows_to_insert.append(tuple(row_data))
-
-        insert_query = f'INSERT INTO {table_name} VALUES ({", ".join(["?"] * len(gdf.columns))})'
-        conn.executemany(insert_query, rows_to_insert)
+    existing_tables = get_existing_tables(conn)
+    # Load every tier in one transaction so the commit cost is paid once
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        for tier, gdf in enumerate(tier_gdfs, start=1):
+            table_name = f'Tier{tier}_Areas'
+            schema = ', '.join([f"{col} VARCHAR" for col in gdf.columns if col != 'geometry'] + ['Geometry GEOMETRY'])
+            if table_name not in existing_tables:
+                conn.execute(f"CREATE TABLE {table_name} ({schema})")
+
+            # Bulk insert through DuckDB's DataFrame scan; geometry is passed as WKB and goes last to match the schema
+            # Missing values stay missing (NULL) rather than becoming the string 'nan' on older pandas
+            attributes = gdf.drop(columns='geometry')
+            df = attributes.astype(str).where(attributes.notna())
+            df['Geometry'] = shapely.to_wkb(gdf.geometry.values)
+            conn.register('tmp_df', df)
+            try:
+                conn.execute(f"INSERT INTO {table_name} SELECT * EXCLUDE (Geometry), ST_GeomFromWKB(Geometry) FROM tmp_df")
+            finally:
+                conn.unregister('tmp_df')
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
 
 
 
@@ -62,11 +77,18 @@ def main():
     base_directory = 'Storage'
     database_path = os.path.join(base_directory, 'canadaserviceareas.duckdb')  # Change the database path
     num_tiers = 5  # Change this to the number of tiers you have
+    threads = 8  # Change this to the number of cores DuckDB may use
+    memory_limit = '4GB'  # Change this to the memory DuckDB may use
     # Load and join tiers
     tier_gdfs = load_and_join_tiers(base_directory, num_tiers)
     # Connect to the existing DuckDB database
     conn = duckdb.connect(database=database_path, read_only=False)
     try:
+        # GEOMETRY columns come from DuckDB's spatial extension
+        conn.execute("INSTALL spatial; LOAD spatial;")
+        # Tune DuckDB for the bulk load
+        conn.execute(f"PRAGMA threads={threads}")
+        conn.execute(f"PRAGMA memory_limit='{memory_limit}'")
         # Create and populate tables
         create_and_populate_tables(conn, tier_gdfs)
         # Get some statistics
@@ -1,28 +1,36 @@
-import pandas as pd
 import geopandas as gpd
 import duckdb
 import os
-from shapely import wkt
-from shapely.errors import ShapelyError
+import pyogrio
+import shapely
 
 def get_table_names(conn):
     query = "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main';"
     result = conn.execute(query).fetchall()
     return [table[0] for table in result]
 
+def get_geometry_type(conn, table_name):
+    query = "SELECT data_type FROM information_schema.columns WHERE table_name = ? AND column_name = 'Geometry'"
+    result = conn.execute(query, [table_name]).fetchone()
+    return result[0] if result else None
+
 def read_table_as_gdf(conn, table_name):
+    geometry_type = get_geometry_type(conn, table_name)
+    if geometry_type is not None and geometry_type != 'VARCHAR':
+        # Native GEOMETRY column: fetch it as WKB and decode the whole column at once
+        query = f"SELECT * EXCLUDE (Geometry), ST_AsWKB(Geometry) AS Geometry FROM {table_name}"
+        # Arrow hands BLOBs over as bytes, which shapely can decode directly
+        df = conn.execute(query).fetch_arrow_table().to_pandas()
+        df['Geometry'] = shapely.from_wkb(df['Geometry'].to_numpy())
+        return gpd.GeoDataFrame(df, geometry='Geometry')
+
+    # Tables written before the GEOMETRY switch store WKT text
     query = f"SELECT * FROM {table_name}"
-    df = pd.read_sql(query, conn)
+    df = conn.execute(query).fetch_arrow_table().to_pandas()
 
-    # Convert the 'Geometry' column from WKT to a shapely object, handling errors
+    # Convert the 'Geometry' column from WKT in one pass; empty or invalid values become None
     if 'Geometry' in df.columns:
-        def convert_geometry(row):
-            try:
-                return wkt.loads(row) if row else None
-            except ShapelyError:
-                return None
-
-        df['Geometry'] = df['Geometry'].apply(convert_geometry)
+        df['Geometry'] = shapely.from_wkt(df['Geometry'].fillna('').to_numpy(), on_invalid='ignore')
         gdf = gpd.GeoDataFrame(df, geometry='Geometry')
     else:
         gdf = gpd.GeoDataFrame(df)
@@ -30,11 +38,12 @@ def read_table_as_gdf(conn, table_name):
     return gdf
 
 def export_table_to_geopackage(gdf, output_file):
-    gdf.to_file(output_file, driver='GPKG')
+    pyogrio.write_dataframe(gdf, output_file, driver='GPKG')
     print(f"Exported to {output_file}")
 
 def export_database_to_geopackage(database_path, output_directory):
     with duckdb.connect(database=database_path) as conn:
+        conn.execute("INSTALL spatial; LOAD spatial;")
         table_names = get_table_names(conn)
         for table_name in table_names:
             gdf = read_table_as_gdf(conn, table_name)